@@ -1,5 +1,5 @@
 import anthropic
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
@@ -51,7 +51,7 @@ Provide only the direct answer to what was asked.
     def generate_response(self, query: str,
                          conversation_history: Optional[str] = None,
                          tools: Optional[List] = None,
-                         tool_manager=None) -> str:
+                         tool_manager=None) -> Tuple[str, list]:
         """
         Generate AI response with optional tool usage and conversation context.
         
@@ -62,7 +62,7 @@ Provide only the direct answer to what was asked.
             tool_manager: Manager to execute tools
             
         Returns:
-            Generated response as string
+            Tuple of (generated response, sources used by any tool calls)
         """
         
         # Build system content efficiently - avoid string ops when possible
@@ -92,7 +92,7 @@ Provide only the direct answer to what was asked.
             return self._handle_tool_execution(response, api_params, tool_manager)
         
         # Return direct response
-        return response.content[0].text
+        return response.content[0].text, []
     
     def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager):
         """
@@ -104,7 +104,7 @@ Provide only the direct answer to what was asked.
             tool_manager: Manager to execute tools
             
         Returns:
-            Final response text after tool execution
+            Tuple of (final response text after tool execution, sources from all tool calls)
         """
         # Start with existing messages
         messages = base_params["messages"].copy()
@@ -112,20 +112,18 @@ Provide only the direct answer to what was asked.
         # Add AI's tool use response
         messages.append({"role": "assistant", "content": initial_response.content})
         
-        # Execute all tool calls and collect results
-        tool_results = []
-        for content_block in initial_response.content:
-            if content_block.type == "tool_use":
-                tool_result = tool_manager.execute_tool(
-                    content_block.name, 
-                    **content_block.input
-                )
-                
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": content_block.id,
-                    "content": tool_result
-                })
+        # Execute all tool calls in one batch and collect results
+        tool_blocks = [block for block in initial_response.content if block.type == "tool_use"]
+        batch_results = tool_manager.execute_tools_batch(
+            [(block.name, block.input) for block in tool_blocks]
+        )
+        
+        tool_results = [{
+            "type": "tool_result",
+            "tool_use_id": block.id,
+            "content": tool_result
+        } for block, (tool_result, _) in zip(tool_blocks, batch_results)]
+        sources = [source for _, call_sources in batch_results for source in call_sources]
         
         # Add tool results as single message
         if tool_results:
@@ -140,4 +138,4 @@ Provide only the direct answer to what was asked.
         
         # Get final response
         final_response = self.client.messages.create(**final_params)
-        return final_response.content[0].text
\ No newline at end of file
+        return final_response.content[0].text, sources
\ No newline at end of file
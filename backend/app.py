@@ -7,6 +7,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import os
 import traceback
 import logging
@@ -73,11 +74,11 @@ async def query_documents(request: QueryRequest):
         if not session_id:
             session_id = rag_system.session_manager.create_session()
         
-        # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        # Process query using RAG system off the event loop (ChromaDB and Anthropic calls block)
+        answer, sources = await asyncio.to_thread(rag_system.query, request.query, session_id)
         
         # Convert source objects to Pydantic models
-        source_objects = [Source(**source) if isinstance(source, dict) else Source(text=source) for source in sources]
+        source_objects = [Source(text=source.text, link=source.link) for source in sources]
         
         return QueryResponse(
             answer=answer,
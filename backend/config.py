@@ -21,6 +21,10 @@ class Config:
     MAX_RESULTS: int = 5         # Maximum search results to return
     MAX_HISTORY: int = 2         # Number of conversation messages to remember
     
+    # Search result cache settings
+    QUERY_CACHE_SIZE: int = 1000  # Maximum cached search results
+    QUERY_CACHE_TTL: int = 300    # Seconds before a cached result expires
+    
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
 
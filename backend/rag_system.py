@@ -21,10 +21,9 @@ class RAGSystem:
         
         # Initialize search tools
         self.tool_manager = ToolManager()
-        self.search_tool = CourseSearchTool(self.vector_store)
+        self.search_tool = CourseSearchTool(self.vector_store, config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
         self.outline_tool = CourseOutlineTool(self.vector_store)
-        self.tool_manager.register_tool(self.search_tool)
-        self.tool_manager.register_tool(self.outline_tool)
+        self.tool_manager.register_tools([self.search_tool, self.outline_tool])
     
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
@@ -120,20 +119,14 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
         
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
+        # Generate response using AI with tools; sources come back with this query's tool calls
+        response, sources = self.ai_generator.generate_response(
             query=prompt,
             conversation_history=history,
             tools=self.tool_manager.get_tool_definitions(),
             tool_manager=self.tool_manager
         )
         
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
-        
         # Update conversation history
         if session_id:
             self.session_manager.add_exchange(session_id, query, response)
@@ -1,53 +1,135 @@
-from typing import Dict, Any, Optional, Protocol
-from abc import ABC, abstractmethod
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from vector_store import VectorStore, SearchResults
+from query_cache import QueryCache
 
 
-class Tool(ABC):
-    """Abstract base class for all tools"""
+class RateLimitFilter(logging.Filter):
+    """
+    Logging filter letting each failure key through at most once per interval.
+    
+    Records are keyed by their ``rate_limit_key`` extra when given, otherwise by message template.
+    """
+    
+    def __init__(self, interval_seconds: float = 60):
+        super().__init__()
+        self.interval_seconds = interval_seconds
+        self._last_emitted: Dict[Tuple[str, Any], float] = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, getattr(record, 'rate_limit_key', record.msg))
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_emitted.get(key)
+            if last is not None and now - last < self.interval_seconds:
+                return False
+            self._last_emitted[key] = now
+        return True
+
+
+logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitFilter())
+
+# Lightweight source reference shown in the UI: display text plus optional lesson link
+SearchSource = namedtuple("SearchSource", ["text", "link"])
+
+
+# Tool definitions are constant, so build them once at import time
+_SEARCH_TOOL_DEF = {
+    "name": "search_course_content",
+    "description": "Search course materials with smart course name matching and lesson filtering",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string", 
+                "description": "What to search for in the course content"
+            },
+            "course_name": {
+                "type": "string",
+                "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')"
+            },
+            "lesson_number": {
+                "type": "integer",
+                "description": "Specific lesson number to search within (e.g. 1, 2, 3)"
+            }
+        },
+        "required": ["query"]
+    }
+}
+
+_OUTLINE_TOOL_DEF = {
+    "name": "get_course_outline",
+    "description": "Get course outline including title, course link, and complete lesson list with numbers and titles",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "course_name": {
+                "type": "string",
+                "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')"
+            }
+        },
+        "required": ["course_name"]
+    }
+}
+
+# "No results" messages keyed by (has course filter, has lesson filter)
+_EMPTY_RESULT_TEMPLATES = {
+    (False, False): "No relevant content found.",
+    (True, False): "No relevant content found in course '{course}'.",
+    (False, True): "No relevant content found in lesson {lesson}.",
+    (True, True): "No relevant content found in course '{course}' in lesson {lesson}.",
+}
+
+
+class Tool:
+    """Base class for all tools; subclasses must override both methods"""
     
-    @abstractmethod
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        pass
+        raise NotImplementedError
     
-    @abstractmethod
     def execute(self, **kwargs) -> str:
         """Execute the tool with given parameters"""
-        pass
+        raise NotImplementedError
+    
+    def execute_with_sources(self, **kwargs) -> Tuple[str, list]:
+        """Execute the tool and return its output with the sources it used (none by default)"""
+        return self.execute(**kwargs), []
+
+
+# Keyword arguments accepted by CourseSearchTool.execute
+_SEARCH_ARGUMENTS = frozenset(("query", "course_name", "lesson_number"))
 
 
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
     
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore, cache_size: int = 1000, cache_ttl: int = 300):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
+        
+        # Cache (formatted results, sources) per normalized search; dropped whenever the store changes
+        self._cache = QueryCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        self.store.add_invalidation_listener(self.invalidate)
+    
+    def invalidate(self):
+        """Drop all cached search results"""
+        self._cache.invalidate()
+    
+    @staticmethod
+    def _cache_key(query: str, course_name: Optional[str], lesson_number: Optional[int]) -> tuple:
+        """Normalize search parameters into a cache key"""
+        return (query.strip().lower(), course_name or "", lesson_number if lesson_number is not None else -1)
     
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "search_course_content",
-            "description": "Search course materials with smart course name matching and lesson filtering",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string", 
-                        "description": "What to search for in the course content"
-                    },
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')"
-                    },
-                    "lesson_number": {
-                        "type": "integer",
-                        "description": "Specific lesson number to search within (e.g. 1, 2, 3)"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
+        return _SEARCH_TOOL_DEF
     
     def execute(self, query: str, course_name: Optional[str] = None, lesson_number: Optional[int] = None) -> str:
         """
@@ -61,6 +143,25 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
+        return self.execute_with_sources(query, course_name, lesson_number)[0]
+    
+    def execute_with_sources(self, query: str, course_name: Optional[str] = None,
+                             lesson_number: Optional[int] = None) -> Tuple[str, list]:
+        """
+        Execute the search and return its output together with the sources it used.
+        
+        Args:
+            query: What to search for
+            course_name: Optional course filter
+            lesson_number: Optional lesson filter
+            
+        Returns:
+            Tuple of (formatted search results or error message, SearchSource list)
+        """
+        key = self._cache_key(query, course_name, lesson_number)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
         
         # Use the vector store's unified search interface
         results = self.store.search(
@@ -69,86 +170,115 @@ class CourseSearchTool(Tool):
             lesson_number=lesson_number
         )
         
+        formatted, sources, cacheable = self._render_results(results, course_name, lesson_number)
+        if cacheable:
+            self._cache.put(key, (formatted, sources))
+        return formatted, sources
+    
+    def execute_batch(self, calls: List[Dict[str, Any]]) -> List[Tuple[str, list]]:
+        """
+        Execute several searches at once, issuing one vector store query per filter combination.
+        
+        Args:
+            calls: List of keyword-argument dicts, as accepted by execute()
+            
+        Returns:
+            (formatted results or error message, SearchSource list) per call, in input order
+        """
+        outputs: List[Tuple[str, list]] = [("", [])] * len(calls)
+        
+        # Serve cached searches; group the rest by shared filters so they are embedded and searched together
+        groups: Dict[Tuple[Optional[str], Optional[int]], List[int]] = {}
+        for index, kwargs in enumerate(calls):
+            # Malformed calls go through execute_with_sources() so they fail exactly as a single call would
+            if "query" not in kwargs or not kwargs.keys() <= _SEARCH_ARGUMENTS:
+                outputs[index] = self.execute_with_sources(**kwargs)
+                continue
+            course_name = kwargs.get("course_name")
+            lesson_number = kwargs.get("lesson_number")
+            cached = self._cache.get(self._cache_key(kwargs["query"], course_name, lesson_number))
+            if cached is not None:
+                outputs[index] = cached
+            else:
+                groups.setdefault((course_name, lesson_number), []).append(index)
+        
+        for (course_name, lesson_number), indices in groups.items():
+            batch_results = self.store.search_batch(
+                queries=[calls[index]["query"] for index in indices],
+                course_name=course_name,
+                lesson_number=lesson_number
+            )
+            for index, results in zip(indices, batch_results):
+                formatted, sources, cacheable = self._render_results(results, course_name, lesson_number)
+                outputs[index] = (formatted, sources)
+                if cacheable:
+                    key = self._cache_key(calls[index]["query"], course_name, lesson_number)
+                    self._cache.put(key, (formatted, sources))
+        
+        return outputs
+    
+    def _render_results(self, results: SearchResults, course_name: Optional[str],
+                        lesson_number: Optional[int]) -> Tuple[str, list, bool]:
+        """Turn search results into the tool's text output and sources, plus whether they may be cached"""
         # Handle errors
         if results.error:
-            return results.error
+            return results.error, [], False
         
         # Handle empty results
         if results.is_empty():
-            filter_info = ""
-            if course_name:
-                filter_info += f" in course '{course_name}'"
-            if lesson_number:
-                filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
+            template = _EMPTY_RESULT_TEMPLATES[(bool(course_name), lesson_number is not None)]
+            return template.format(course=course_name, lesson=lesson_number), [], True
         
         # Format and return results
         return self._format_results(results)
     
-    def _format_results(self, results: SearchResults) -> str:
-        """Format search results with course and lesson context"""
-        formatted = []
-        sources = []  # Track sources for the UI with links
+    def _format_results(self, results: SearchResults) -> Tuple[str, list, bool]:
+        """Format search results and their sources; the flag is False if lesson links failed to load"""
+        # (course title, lesson number) per result; the label doubles as header and source text
+        keys = [(meta.get('course_title', 'unknown'), meta.get('lesson_number')) for meta in results.metadata]
+        labels = [
+            f"{course_title} - Lesson {lesson_num}" if lesson_num is not None else course_title
+            for course_title, lesson_num in keys
+        ]
         
-        for doc, meta in zip(results.documents, results.metadata):
-            course_title = meta.get('course_title', 'unknown')
-            lesson_num = meta.get('lesson_number')
-            
-            # Build context header
-            header = f"[{course_title}"
-            if lesson_num is not None:
-                header += f" - Lesson {lesson_num}"
-            header += "]"
-            
-            # Create source with link information
-            source_text = course_title
-            if lesson_num is not None:
-                source_text += f" - Lesson {lesson_num}"
-                
-            # Try to get lesson link from vector store
-            lesson_link = None
-            if lesson_num is not None:
-                try:
-                    lesson_link = self.store.get_lesson_link(course_title, lesson_num)
-                except Exception as e:
-                    print(f"Error getting lesson link: {e}")
-            
-            # Create source object with text and optional link
-            source = {
-                'text': source_text,
-                'link': lesson_link
-            }
-            sources.append(source)
-            
-            formatted.append(f"{header}\n{doc}")
+        # Look up every lesson link the results need in a single catalog call
+        needed = {key for key in keys if key[1] is not None}
+        lesson_links = {}
+        links_loaded = True
+        if needed:
+            try:
+                lesson_links = self.store.get_lesson_links(needed)
+            except Exception as e:
+                links_loaded = False
+                logger.warning(
+                    "lesson link fetch failed pairs=%s err=%s", needed, e,
+                    extra={'rate_limit_key': (type(e).__name__, frozenset(title for title, _ in needed))}
+                )
         
-        # Store sources for retrieval
-        self.last_sources = sources
+        # Track sources for the UI with links
+        get_link = lesson_links.get
+        sources = [SearchSource(label, get_link(key)) for label, key in zip(labels, keys)]
+        formatted = [f"[{label}]\n{doc}" for label, doc in zip(labels, results.documents)]
         
-        return "\n\n".join(formatted)
+        return "\n\n".join(formatted), sources, links_loaded
 
 class CourseOutlineTool(Tool):
     """Tool for retrieving course outline with metadata, lessons list"""
     
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
+        
+        # Rendered outline per resolved course title (bounded by catalog size); dropped whenever the store changes
+        self._outline_cache: Dict[str, str] = {}
+        self.store.add_invalidation_listener(self.invalidate)
+    
+    def invalidate(self):
+        """Drop all cached outlines"""
+        self._outline_cache.clear()
     
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "get_course_outline",
-            "description": "Get course outline including title, course link, and complete lesson list with numbers and titles",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')"
-                    }
-                },
-                "required": ["course_name"]
-            }
-        }
+        return _OUTLINE_TOOL_DEF
     
     def execute(self, course_name: str) -> str:
         """
@@ -160,11 +290,15 @@ class CourseOutlineTool(Tool):
         Returns:
             Formatted course outline or error message
         """
-        # Resolve course name using vector search for fuzzy matching
-        course_title = self.store._resolve_course_name(course_name)
+        # Resolve course name via exact/substring title match, falling back to vector search
+        course_title = self.store.resolve_course_name_fast(course_name)
         if not course_title:
             return f"No course found matching '{course_name}'"
         
+        cached = self._outline_cache.get(course_title)
+        if cached is not None:
+            return cached
+        
         # Get course metadata from catalog
         try:
             results = self.store.course_catalog.get(ids=[course_title])
@@ -179,29 +313,27 @@ class CourseOutlineTool(Tool):
             course_link = metadata.get('course_link', '')
             lesson_count = metadata.get('lesson_count', 0)
             
-            # Parse lessons from JSON
-            import json
+            # Parse lessons from JSON; courses stored before ingestion sorted them may be out of
+            # order, so always sort (runs once per course thanks to the outline cache)
             lessons_json = metadata.get('lessons_json', '[]')
-            lessons = json.loads(lessons_json)
+            lessons = sorted(json.loads(lessons_json), key=lambda x: x.get('lesson_number', 0))
             
-            # Format the response
-            response = f"Course Title: {title}\n"
+            # Format the response from line fragments joined once
+            parts = [f"Course Title: {title}"]
             if instructor:
-                response += f"Instructor: {instructor}\n"
+                parts.append(f"Instructor: {instructor}")
             if course_link:
-                response += f"Course Link: {course_link}\n"
-            
-            response += f"\nLessons ({lesson_count} total):\n"
-            
-            # Sort lessons by lesson number to ensure proper order
-            sorted_lessons = sorted(lessons, key=lambda x: x.get('lesson_number', 0))
+                parts.append(f"Course Link: {course_link}")
             
-            for lesson in sorted_lessons:
-                lesson_num = lesson.get('lesson_number', 'Unknown')
-                lesson_title = lesson.get('lesson_title', 'Untitled')
-                response += f"Lesson {lesson_num}: {lesson_title}\n"
+            parts.append(f"\nLessons ({lesson_count} total):")
+            parts.extend(
+                f"Lesson {lesson.get('lesson_number', 'Unknown')}: {lesson.get('lesson_title', 'Untitled')}"
+                for lesson in lessons
+            )
             
-            return response.strip()
+            response = "\n".join(parts)
+            self._outline_cache[course_title] = response
+            return response
             
         except Exception as e:
             return f"Error retrieving course outline: {str(e)}"
@@ -212,37 +344,86 @@ class ToolManager:
     
     def __init__(self):
         self.tools = {}
+        # Shared pool for running heterogeneous tool calls concurrently
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        # Tool definitions captured at registration, served as-is on every request
+        self._defs_by_name: Dict[str, Dict[str, Any]] = {}
+        self._definitions_cache: list = []
     
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
-        tool_def = tool.get_tool_definition()
-        tool_name = tool_def.get("name")
-        if not tool_name:
-            raise ValueError("Tool must have a 'name' in its definition")
-        self.tools[tool_name] = tool
-
+        self.register_tools([tool])
+    
+    def register_tools(self, tools: Iterable[Tool]):
+        """Register several tools, rebuilding the cached lookups once"""
+        # Validate every definition before touching any state
+        entries = []
+        for tool in tools:
+            tool_def = tool.get_tool_definition()
+            tool_name = tool_def.get("name")
+            if not tool_name:
+                raise ValueError("Tool must have a 'name' in its definition")
+            entries.append((tool_name, tool_def, tool))
+        
+        for tool_name, tool_def, tool in entries:
+            self.tools[tool_name] = tool
+            self._defs_by_name[tool_name] = tool_def
+        
+        self._definitions_cache = list(self._defs_by_name.values())
     
     def get_tool_definitions(self) -> list:
         """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        return self._definitions_cache
     
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
-        if tool_name not in self.tools:
-            return f"Tool '{tool_name}' not found"
-        
-        return self.tools[tool_name].execute(**kwargs)
-    
-    def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources') and tool.last_sources:
-                return tool.last_sources
-        return []
-
-    def reset_sources(self):
-        """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources'):
-                tool.last_sources = []
\ No newline at end of file
+        return self.execute_tools_batch([(tool_name, kwargs)])[0][0]
+    
+    def execute_tools_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, list]]:
+        """
+        Execute several tool calls, batching calls to the same tool where supported.
+        
+        Sources are returned with each call rather than stored on the tools, so
+        concurrent requests never see each other's sources.
+        
+        Args:
+            calls: List of (tool_name, kwargs) pairs
+            
+        Returns:
+            (tool output, sources used) per call, in the same order as the calls
+        """
+        outputs: List[Tuple[str, list]] = [("", [])] * len(calls)
+        
+        # Partition call indices by tool name
+        grouped: Dict[str, List[int]] = {}
+        for index, (tool_name, _) in enumerate(calls):
+            grouped.setdefault(tool_name, []).append(index)
+        
+        # Each job is (call indices, function returning one output per index)
+        jobs = []
+        for tool_name, indices in grouped.items():
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                for index in indices:
+                    outputs[index] = (f"Tool '{tool_name}' not found", [])
+                continue
+            if len(indices) > 1 and hasattr(tool, 'execute_batch'):
+                batch_kwargs = [calls[index][1] for index in indices]
+                jobs.append((indices, lambda tool=tool, batch_kwargs=batch_kwargs: tool.execute_batch(batch_kwargs)))
+            else:
+                for index in indices:
+                    kwargs = calls[index][1]
+                    jobs.append(([index], lambda tool=tool, kwargs=kwargs: [tool.execute_with_sources(**kwargs)]))
+        
+        # Run a lone job inline; fan heterogeneous jobs out to a small thread pool
+        if len(jobs) == 1:
+            job_outputs = [jobs[0][1]()]
+        else:
+            futures = [self._executor.submit(run) for _, run in jobs]
+            job_outputs = [future.result() for future in futures]
+        
+        for (indices, _), results in zip(jobs, job_outputs):
+            for index, result in zip(indices, results):
+                outputs[index] = result
+        
+        return outputs
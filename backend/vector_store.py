@@ -1,6 +1,7 @@
+import json
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
 from dataclasses import dataclass
 from models import Course, CourseChunk
 from sentence_transformers import SentenceTransformer
@@ -14,12 +15,12 @@ class SearchResults:
     error: Optional[str] = None
     
     @classmethod
-    def from_chroma(cls, chroma_results: Dict) -> 'SearchResults':
-        """Create SearchResults from ChromaDB query results"""
+    def from_chroma(cls, chroma_results: Dict, index: int = 0) -> 'SearchResults':
+        """Create SearchResults from ChromaDB query results (one entry per query text)"""
         return cls(
-            documents=chroma_results['documents'][0] if chroma_results['documents'] else [],
-            metadata=chroma_results['metadatas'][0] if chroma_results['metadatas'] else [],
-            distances=chroma_results['distances'][0] if chroma_results['distances'] else []
+            documents=chroma_results['documents'][index] if chroma_results['documents'] else [],
+            metadata=chroma_results['metadatas'][index] if chroma_results['metadatas'] else [],
+            distances=chroma_results['distances'][index] if chroma_results['distances'] else []
         )
     
     @classmethod
@@ -50,6 +51,25 @@ class VectorStore:
         # Create collections for different types of data
         self.course_catalog = self._create_collection("course_catalog")  # Course titles/instructors
         self.course_content = self._create_collection("course_content")  # Actual course material
+        
+        # Callbacks fired whenever stored data changes (used to drop stale caches)
+        self._invalidation_listeners: List[Callable[[], None]] = []
+        
+        self._title_index: Optional[Dict[str, str]] = None  # lowercased title -> title, built lazily
+        self.add_invalidation_listener(self._reset_title_index)
+    
+    def add_invalidation_listener(self, callback: Callable[[], None]):
+        """Register a callback to be invoked whenever course data is modified"""
+        self._invalidation_listeners.append(callback)
+    
+    def _notify_data_changed(self):
+        """Invoke all invalidation listeners after a write"""
+        for callback in self._invalidation_listeners:
+            callback()
+    
+    def _reset_title_index(self):
+        """Drop the title index so it is rebuilt on next use"""
+        self._title_index = None
     
     def _create_collection(self, name: str):
         """Create or get a ChromaDB collection"""
@@ -75,29 +95,53 @@ class VectorStore:
         Returns:
             SearchResults object with documents and metadata
         """
-        # Step 1: Resolve course name if provided
+        return self.search_batch([query], course_name, lesson_number, limit)[0]
+    
+    def search_batch(self,
+                     queries: List[str],
+                     course_name: Optional[str] = None,
+                     lesson_number: Optional[int] = None,
+                     limit: Optional[int] = None) -> List[SearchResults]:
+        """
+        Search several queries sharing the same filters in a single ChromaDB call.
+        
+        Args:
+            queries: Texts to search for in course content
+            course_name: Optional course name/title to filter by
+            lesson_number: Optional lesson number to filter by
+            limit: Maximum results to return per query
+            
+        Returns:
+            List of SearchResults, one per query in input order
+        """
+        if not queries:
+            return []
+        
+        # Step 1: Resolve course name once for the whole batch (same resolution as the outline tool)
         course_title = None
         if course_name:
-            course_title = self._resolve_course_name(course_name)
+            course_title = self.resolve_course_name_fast(course_name)
             if not course_title:
-                return SearchResults.empty(f"No course found matching '{course_name}'")
+                error = SearchResults.empty(f"No course found matching '{course_name}'")
+                return [error] * len(queries)
         
         # Step 2: Build filter for content search
         filter_dict = self._build_filter(course_title, lesson_number)
         
-        # Step 3: Search course content
+        # Step 3: Search course content with one embedding pass and one ANN query for all texts
         # Use provided limit or fall back to configured max_results
         search_limit = limit if limit is not None else self.max_results
         
         try:
             results = self.course_content.query(
-                query_texts=[query],
+                query_texts=list(queries),
                 n_results=search_limit,
                 where=filter_dict
             )
-            return SearchResults.from_chroma(results)
+            return [SearchResults.from_chroma(results, i) for i in range(len(queries))]
         except Exception as e:
-            return SearchResults.empty(f"Search error: {str(e)}")
+            error = SearchResults.empty(f"Search error: {str(e)}")
+            return [error] * len(queries)
     
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
         """Use vector search to find best matching course by name"""
@@ -115,6 +159,29 @@ class VectorStore:
         
         return None
     
+    def resolve_course_name_fast(self, course_name: str) -> Optional[str]:
+        """Resolve a course name by exact or unique substring title match, falling back to vector search"""
+        if self._title_index is None:
+            # Only cache the index when the catalog fetch succeeds, so a transient error is retried
+            try:
+                results = self.course_catalog.get()
+                self._title_index = {title.lower(): title for title in results['ids']}
+            except Exception as e:
+                print(f"Error building course title index: {e}")
+        title_index = self._title_index or {}
+        
+        name = course_name.strip().lower()
+        title = title_index.get(name)
+        if title:
+            return title
+        
+        if name:
+            matches = [title for key, title in title_index.items() if name in key]
+            if len(matches) == 1:
+                return matches[0]
+        
+        return self._resolve_course_name(course_name)
+    
     def _build_filter(self, course_title: Optional[str], lesson_number: Optional[int]) -> Optional[Dict]:
         """Build ChromaDB filter from search parameters"""
         if not course_title and lesson_number is None:
@@ -134,13 +201,11 @@ class VectorStore:
     
     def add_course_metadata(self, course: Course):
         """Add course information to the catalog for semantic search"""
-        import json
-
         course_text = course.title
         
-        # Build lessons metadata and serialize as JSON string
+        # Build lessons metadata in lesson-number order (readers still sort, as older entries may not be)
         lessons_metadata = []
-        for lesson in course.lessons:
+        for lesson in sorted(course.lessons, key=lambda lesson: lesson.lesson_number):
             lessons_metadata.append({
                 "lesson_number": lesson.lesson_number,
                 "lesson_title": lesson.title,
@@ -158,6 +223,7 @@ class VectorStore:
             }],
             ids=[course.title]
         )
+        self._notify_data_changed()
     
     def add_course_content(self, chunks: List[CourseChunk]):
         """Add course content chunks to the vector store"""
@@ -178,6 +244,7 @@ class VectorStore:
             metadatas=metadatas,
             ids=ids
         )
+        self._notify_data_changed()
     
     def clear_all_data(self):
         """Clear all data from both collections"""
@@ -189,6 +256,8 @@ class VectorStore:
             self.course_content = self._create_collection("course_content")
         except Exception as e:
             print(f"Error clearing data: {e}")
+        finally:
+            self._notify_data_changed()
     
     def get_existing_course_titles(self) -> List[str]:
         """Get all existing course titles from the vector store"""
@@ -215,7 +284,6 @@ class VectorStore:
     
     def get_all_courses_metadata(self) -> List[Dict[str, Any]]:
         """Get metadata for all courses in the vector store"""
-        import json
         try:
             results = self.course_catalog.get()
             if results and 'metadatas' in results:
@@ -246,22 +314,32 @@ class VectorStore:
             print(f"Error getting course link: {e}")
             return None
     
-    def get_lesson_link(self, course_title: str, lesson_number: int) -> Optional[str]:
-        """Get lesson link for a given course title and lesson number"""
-        import json
-        try:
-            # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
-            if results and 'metadatas' in results and results['metadatas']:
-                metadata = results['metadatas'][0]
-                lessons_json = metadata.get('lessons_json')
-                if lessons_json:
-                    lessons = json.loads(lessons_json)
-                    # Find the lesson with matching number
-                    for lesson in lessons:
-                        if lesson.get('lesson_number') == lesson_number:
-                            return lesson.get('lesson_link')
-            return None
-        except Exception as e:
-            print(f"Error getting lesson link: {e}")
-            return None
\ No newline at end of file
+    def get_lesson_links(self, pairs: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], Optional[str]]:
+        """
+        Get lesson links for many (course title, lesson number) pairs with a single catalog lookup.
+        
+        Args:
+            pairs: (course_title, lesson_number) pairs to look up
+            
+        Returns:
+            Dict mapping each requested pair to its lesson link (None if unknown)
+            
+        Raises:
+            Exception: Catalog or JSON errors are propagated, unlike the other read
+                methods, so callers can handle a failed batch once
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        
+        # Fetch every referenced course in one round-trip (title is the ID)
+        course_titles = list({course_title for course_title, _ in pairs})
+        results = self.course_catalog.get(ids=course_titles)
+        
+        lesson_links = {}
+        for course_title, metadata in zip(results.get('ids') or [], results.get('metadatas') or []):
+            lessons = json.loads(metadata.get('lessons_json') or '[]')
+            for lesson in lessons:
+                lesson_links[(course_title, lesson.get('lesson_number'))] = lesson.get('lesson_link')
+        
+        return {pair: lesson_links.get(pair) for pair in pairs}